@@ -1,5 +1,6 @@
 """Application configuration module."""
-from pydantic_settings import BaseSettings
+from functools import cached_property
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -19,6 +20,8 @@ class Settings(BaseSettings):
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 3600
     DB_POOL_PRE_PING: bool = True
+    DB_POOL_AUTOSIZE: bool = True
+    APP_REPLICAS: int = 1
 
     # Redis Configuration
     REDIS_HOST: str = "localhost"
@@ -27,8 +30,20 @@ class Settings(BaseSettings):
     REDIS_USER: str = ""
     REDIS_PASSWORD: str = ""
     REDIS_URL: str | None = None
-
-    # Gemini API Configuration
+    REDIS_UNIX_SOCKET: str = ""
+    REDIS_POOL_SIZE: int = 50
+    REDIS_WRITE_BATCH_SIZE: int = 256
+    REDIS_WRITE_BATCH_DELAY: float = 0.005
+
+    # Cache Configuration
+    CACHE_L1_MAXSIZE: int = 10000
+    CACHE_L1_TTL: int = 300
+    CACHE_PREWARM_LIMIT: int = 5000
+    IPFS_CACHE_TTL: int = 604800
+    IPFS_CACHE_MAX_BYTES: int = 2 * 1024 * 1024
+    IPFS_PART_CACHE_BYTES: int = 64 * 1024 * 1024
+    IPFS_MAX_IMAGE_BYTES: int = 20 * 1024 * 1024
+    IPFS_HEDGE_DELAY: float = 0.2
 
     # Gemini API Configuration
     GEMINI_API_KEY: str = ""
@@ -44,28 +59,28 @@ class Settings(BaseSettings):
     CORS_METHODS: str = "*"
     CORS_HEADERS: str = "*"
 
-    @property
+    @cached_property
     def cors_origins_list(self) -> list:
         """Parse CORS origins from comma-separated string."""
         if self.CORS_ORIGINS == "*":
             return ["*"]
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
-    @property
+    @cached_property
     def cors_methods_list(self) -> list:
         """Parse CORS methods from comma-separated string."""
         if self.CORS_METHODS == "*":
             return ["*"]
         return [method.strip() for method in self.CORS_METHODS.split(",")]
 
-    @property
+    @cached_property
     def cors_headers_list(self) -> list:
         """Parse CORS headers from comma-separated string."""
         if self.CORS_HEADERS == "*":
             return ["*"]
         return [header.strip() for header in self.CORS_HEADERS.split(",")]
 
-    @property
+    @cached_property
     def database_url(self) -> str:
         """Construct PostgreSQL connection URL."""
         if self.POSTGRES_URL:
@@ -76,7 +91,16 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
-    model_config = {"env_file": ".env", "case_sensitive": True}
+    @cached_property
+    def async_database_url(self) -> str:
+        """Construct PostgreSQL connection URL for the asyncpg driver."""
+        return (
+            self.database_url
+            .replace("postgresql://", "postgresql+asyncpg://", 1)
+            .replace("sslmode=", "ssl=")
+        )
+
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
 settings = Settings()
@@ -1,16 +1,38 @@
 """API endpoint controllers."""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import orjson
+from functools import partial
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import GeminiRequest, GeminiResponse
-from app.database import get_db, GeminiCache
+from app.config import settings
+from app.database import GeminiCache, SessionLocal
 from app.redis_client import redis_client
 from app.gemini_service import gemini_service
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+logger = logging.getLogger(__name__)
 
 # Create API router
 router = APIRouter()
 
+# Process-local cache tier in front of Redis, owned by the Redis client so
+# that deleting an entry evicts it from both tiers
+_l1: TTLCache = redis_client.local
+
+# In-flight miss resolutions keyed by workId, shared by concurrent cache misses
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def json_response(body: bytes) -> Response:
+    """Send an already encoded GeminiResponse JSON body without re-serializing it."""
+    return Response(content=body, media_type="application/json")
+
 
 @router.get("/")
 async def root():
@@ -28,57 +50,111 @@ async def root():
     summary="Call Gemini API with caching",
     description="Sends a request to Gemini API. Responses are cached in Redis and PostgreSQL to avoid overcalling the API."
 )
-async def call_gemini(
-    request: GeminiRequest,
-    db: Session = Depends(get_db)
-) -> GeminiResponse:
+async def call_gemini(request: GeminiRequest) -> Response:
     """
     Call Gemini API with caching mechanism.
 
-    First checks Redis cache, then PostgreSQL, and finally calls the API if not cached.
+    First checks the in-process cache, then Redis, then PostgreSQL while the
+    images are prefetched, and finally calls the API if not cached.
 
     Args:
         request: Request body with hash and expected fields
-        db: Database session dependency
 
     Returns:
-        GeminiResponse with badge classification and details
+        Badge classification and details shaped like GeminiResponse. Entries
+        are sent as pre-encoded JSON, skipping model re-validation; they
+        are validated against GeminiResponse once, before being cached.
     """
-    hash_keys = [h.replace("ipfs://", "") for h in request.hashes]
     work_id = request.workId
 
-    # Check Redis cache first (fastest)
-    cached_data = await redis_client.get_cache(work_id)
-    if cached_data:
-        return GeminiResponse(
-            badge=cached_data["badge"],
-            details=cached_data["details"]
-        )
+    # Check process-local cache first (no network round-trip)
+    cached_body = _l1.get(work_id)
+    if cached_body is not None:
+        return json_response(cached_body)
 
-    # Check PostgreSQL cache (persistent storage)
-    stmt = select(GeminiCache).where(GeminiCache.id == work_id)
-    db_cache = db.execute(stmt).first()
+    # Redis holds the response JSON; pass it through unparsed
+    cached_body = await redis_client.get_json_and_touch(work_id)
+    if cached_body is not None:
+        _l1[work_id] = cached_body
+        return json_response(cached_body)
 
-    if db_cache:
-        db_cache = db_cache[0]  # Unwrap from SQLAlchemy Row
-        # Store in Redis for faster subsequent access
-        cache_data = {
-            "badge": db_cache.badge,
-            "details": db_cache.details
-        }
-        await redis_client.set_cache(work_id, cache_data)
-
-        return GeminiResponse(
-            badge=db_cache.badge,  # type: ignore
-            details=db_cache.details  # type: ignore
+    # Redis missed: coalesce concurrent misses for the same workId, so they
+    # share one PostgreSQL lookup, one image download and one Gemini call. The
+    # work runs in a task of its own, so a caller that goes away (client
+    # disconnect, timeout) never cancels it for the others
+    shared = _inflight.get(work_id)
+    if shared is None:
+        hash_keys = [h.removeprefix("ipfs://").removeprefix("/ipfs/") for h in request.hashes]
+        shared = asyncio.create_task(
+            resolve_cache_miss(work_id, hash_keys, request.expected)
         )
+        _inflight[work_id] = shared
+        shared.add_done_callback(partial(_forget_inflight, work_id))
+    cache_data = await asyncio.shield(shared)
+    cached_body = _l1[work_id] = orjson.dumps(cache_data)
+
+    return json_response(cached_body)
+
+
+def discard_prefetch(prefetch: asyncio.Task):
+    """Cancel an image prefetch whose result is no longer needed."""
+    prefetch.cancel()
+    # Mark retrieved when the prefetch already failed
+    prefetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+def _forget_inflight(work_id: str, task: asyncio.Task):
+    """Drop a finished miss resolution from the in-flight table."""
+    if _inflight.get(work_id) is task:
+        del _inflight[work_id]
+    if not task.cancelled():
+        task.exception()  # Mark retrieved when every waiter went away
+
+
+async def lookup_db_cache(db: AsyncSession, work_id: str) -> dict | None:
+    """
+    Fetch a cache entry from PostgreSQL.
 
-    # Not in cache, call Gemini API
+    Args:
+        db: Database session
+        work_id: Work ID used as cache key
+
+    Returns:
+        Cache entry dict with badge and details, or None
+    """
+    stmt = select(GeminiCache.badge, GeminiCache.details).where(GeminiCache.id == work_id)
+    row = (await db.execute(stmt)).one_or_none()
+    return row._asdict() if row else None
+
+
+async def generate_cache_entry(
+    hash_keys: list[str],
+    expected: str,
+    prefetch: asyncio.Task | None = None
+) -> dict:
+    """
+    Call Gemini API and build the cache entry for its result.
+
+    Args:
+        hash_keys: Bare IPFS CIDs (no "ipfs://" or "/ipfs/" prefix)
+        expected: Expected value or context
+        prefetch: Task already downloading the image parts for `hash_keys`
+
+    Returns:
+        Cache entry dict with badge and details
+
+    Raises:
+        HTTPException: 503 if the call fails or returns an invalid badge
+    """
     try:
+        parts = await prefetch if prefetch is not None else None
         badge, details = await gemini_service.generate_response(
             hashes=hash_keys,
-            expected_value=request.expected
+            expected_value=expected,
+            parts=parts
         )
+        # Validate once here; cached entries are served without re-validation
+        cache_data = GeminiResponse(badge=badge, details=details).model_dump()
     except Exception as e:
         # Raise 503 for Gemini API errors (will be caught by middleware)
         raise HTTPException(
@@ -86,26 +162,117 @@ async def call_gemini(
             detail=f"Failed to call Gemini API: {str(e)}"
         )
 
-    # Cache the response in both Redis and PostgreSQL
-    cache_data = {
-        "badge": badge,
-        "details": details
-    }
-    await redis_client.set_cache(work_id, cache_data)
+    return cache_data
+
 
-    # Store in PostgreSQL
-    new_cache = GeminiCache(
+async def resolve_cache_miss(
+    work_id: str,
+    hash_keys: list[str],
+    expected: str,
+    session_factory=SessionLocal
+) -> dict:
+    """
+    Resolve a Redis miss from PostgreSQL, or else call Gemini API and persist
+    the result.
+
+    Runs as the shared in-flight task for the workId, so it uses its own
+    session and stores the entry even when the request that started it has
+    gone away.
+
+    Args:
+        work_id: Work ID used as cache key
+        hash_keys: Bare IPFS CIDs (no "ipfs://" or "/ipfs/" prefix)
+        expected: Expected value or context
+        session_factory: Async session factory to look the entry up with
+
+    Returns:
+        Cache entry dict with badge and details
+    """
+    # Download the images while PostgreSQL is probed, so a miss there does
+    # not pay for the IPFS fetch after the lookup
+    prefetch = asyncio.create_task(gemini_service.download_images(hash_keys))
+    try:
+        async with session_factory() as db:
+            cache_data = await lookup_db_cache(db, work_id)
+    except BaseException:
+        discard_prefetch(prefetch)
+        raise
+    if cache_data is not None:
+        discard_prefetch(prefetch)
+        # Store in Redis for faster subsequent access
+        redis_client.queue_cache(work_id, cache_data)
+        return cache_data
+
+    cache_data = await generate_cache_entry(hash_keys, expected, prefetch)
+    await store_cache_entry(work_id, cache_data)
+    return cache_data
+
+
+async def store_cache_entry(work_id: str, cache_data: dict, session_factory=SessionLocal):
+    """
+    Store a generated entry in Redis and PostgreSQL.
+
+    Runs inside the shared in-flight task, so it uses its own session and
+    logs failures instead of failing the responses waiting on that task.
+
+    Args:
+        work_id: Work ID used as cache key
+        cache_data: Cache entry dict with badge and details
+        session_factory: Async session factory to write the entry with
+    """
+    # Redis: batched with other pending writes, independent of PostgreSQL
+    redis_client.queue_cache(work_id, cache_data)
+
+    # PostgreSQL: concurrent requests for the same workId may race here
+    insert_stmt = pg_insert(GeminiCache).values(
         id=work_id,
-        badge=badge,
-        details=details
-    )
-    db.add(new_cache)
-    db.commit()
+        badge=cache_data["badge"],
+        details=cache_data["details"]
+    ).on_conflict_do_nothing(index_elements=["id"])
+    try:
+        async with session_factory() as db:
+            await db.execute(insert_stmt)
+            await db.commit()
+    except Exception as e:
+        logger.error("Failed to store cache entry for %s: %s", work_id, e)
 
-    return GeminiResponse(
-        badge=badge,
-        details=details
+
+async def prewarm_cache(session_factory=SessionLocal):
+    """
+    Load the most recently updated PostgreSQL entries into Redis and the
+    in-process cache so the first requests after a restart skip PostgreSQL.
+
+    Args:
+        session_factory: Async session factory to read entries from
+    """
+    limit = settings.CACHE_PREWARM_LIMIT
+    if limit <= 0:
+        return
+
+    stmt = (
+        select(GeminiCache.id, GeminiCache.badge, GeminiCache.details)
+        .order_by(GeminiCache.updated_at.desc())
+        .limit(limit)
+        .execution_options(yield_per=500)
     )
+    count = 0
+    try:
+        async with session_factory() as db:
+            # Stream rows in batches instead of materializing the whole result
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                items = {
+                    row.id: {"badge": row.badge, "details": row.details}
+                    for row in rows
+                }
+                _l1.update((key, orjson.dumps(value)) for key, value in items.items())
+                await redis_client.set_many(items)
+                count += len(items)
+    except Exception as e:
+        logger.error("Cache prewarm failed: %s", e)
+        return
+
+    logger.info("Prewarmed cache with %s entries", count)
 
 
 @router.get("/health")
@@ -1,13 +1,57 @@
 """Database configuration and models."""
-from sqlalchemy import create_engine, Column, String, Text, DateTime, func
-from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
+import psycopg2
+from sqlalchemy import Column, String, Text, DateTime, Index, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
 from app.config import settings
 
-# Create SQLAlchemy engine with connection pooling
-engine = create_engine(
-    settings.database_url,
-    pool_size=settings.DB_POOL_SIZE,
-    max_overflow=settings.DB_MAX_OVERFLOW,
+logger = logging.getLogger(__name__)
+
+
+def bounded_pool_limits(max_connections: int) -> tuple[int, int]:
+    """
+    Bound the configured pool limits by this replica's share of connections.
+
+    Args:
+        max_connections: PostgreSQL `max_connections` server setting
+
+    Returns:
+        Tuple of (pool_size, max_overflow)
+    """
+    budget = max(1, max_connections // max(1, settings.APP_REPLICAS))
+    pool_size = min(settings.DB_POOL_SIZE, budget)
+    max_overflow = min(settings.DB_MAX_OVERFLOW, budget - pool_size)
+    return pool_size, max_overflow
+
+
+def resolve_pool_limits() -> tuple[int, int]:
+    """Query the server's `max_connections` once and derive safe pool limits."""
+    if not settings.DB_POOL_AUTOSIZE:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+
+    try:
+        conn = psycopg2.connect(settings.database_url, connect_timeout=3)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SHOW max_connections")
+                max_connections = int(cur.fetchone()[0])
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("Could not read max_connections, using configured pool size: %s", e)
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+
+    return bounded_pool_limits(max_connections)
+
+
+pool_size, max_overflow = resolve_pool_limits()
+
+# Create async SQLAlchemy engine (asyncpg) with connection pooling
+engine = create_async_engine(
+    settings.async_database_url,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
     pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_recycle=settings.DB_POOL_RECYCLE,
     pool_pre_ping=settings.DB_POOL_PRE_PING,
@@ -15,7 +59,12 @@ engine = create_engine(
 )
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
@@ -25,6 +74,11 @@ class GeminiCache(Base):
     """Database model for caching Gemini API responses."""
     
     __tablename__ = "gemini_cache"
+    __table_args__ = (
+        # Serves the most-recently-updated scan used to prewarm caches
+        Index("ix_gemini_cache_updated_at", "updated_at"),
+    )
+
     id = Column(String, primary_key=True, index=True)
     # hash = Column(Text, primary_key=True, index=True)
     badge = Column(String, nullable=False)
@@ -33,15 +87,26 @@ class GeminiCache(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
-def init_db():
+def create_schema(conn):
+    """Create missing tables and indexes on a synchronous connection."""
+    Base.metadata.create_all(conn)
+    # create_all skips indexes added to tables that already exist
+    for index in GeminiCache.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+async def init_db():
     """Initialize database tables."""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema)
+
 
+async def close_db():
+    """Dispose of the engine's connection pool."""
+    await engine.dispose()
 
-def get_db():
+
+async def get_db():
     """Database session dependency for FastAPI."""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,27 +1,24 @@
 """Gemini API service."""
+import asyncio
+import re
+from functools import lru_cache
+from cachetools import LRUCache
 from google import genai
 from google.genai import types
-from typing import Any, Tuple, Literal
+from typing import Tuple, Literal
 from app.config import settings
+from app.redis_client import redis_client
 import httpx
 
 
-class GeminiService:
-    """Service for interacting with Google Gemini API."""
-
-    def __init__(self):
-        """Initialize Gemini client."""
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        self.model_id = "gemini-2.5-flash-lite"
-
-    def get_prompt(self, expected: str) -> str:
-        """Generate prompt for Gemini API based on hash and expected value."""
-        return f"""
+# Constant juror rules, sent as the system instruction so every request shares
+# the same prefix and Gemini can reuse it through implicit context caching
+_SYSTEM_INSTRUCTION = """
     You are an art juror.
 
      Given the following information:
      - The uploaded resources 
-     - Expected: {expected}
+     - Expected: the value given after the resources
 
      Task: Decide whether the resources contains the EXPECTED content between all of them.
 
@@ -52,148 +49,259 @@ class GeminiService:
 
      Follow these rules exactly. Any deviation is unacceptable.
      """
+_GENERATE_CONFIG = types.GenerateContentConfig(system_instruction=_SYSTEM_INSTRUCTION)
+
+# Public IPFS gateways in hedging order
+IPFS_GATEWAYS = [
+    "https://gateway.pinata.cloud/ipfs/{}",
+    "https://cloudflare-ipfs.com/ipfs/{}",
+    "https://ipfs.io/ipfs/{}",
+    "https://dweb.link/ipfs/{}",
+    "https://nftstorage.link/ipfs/{}",
+]
+
+# DETAILS: <...> line followed by a later CLASSIFICATION: <...> line
+_RESPONSE_RE = re.compile(
+    r"^[ \t]*DETAILS:[ \t]*(?P<details>.*?)[ \t\r]*$"
+    r"(?:\n.*)*?"
+    r"\n[ \t]*CLASSIFICATION:[ \t]*(?P<cls>.*?)[ \t\r]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Badge keywords, matched case-insensitively in one scan; group 1 marks NEEDS REVISION
+_BADGE_RE = re.compile(r"(NEEDS REVISION)|MATCHS WITH DESCRIPTION", re.IGNORECASE)
+
+
+class IPFSDownloadError(Exception):
+    """Raised when an image cannot be downloaded from any IPFS gateway."""
+
+
+class GeminiService:
+    """Service for interacting with Google Gemini API."""
+
+    def __init__(self):
+        """Initialize Gemini client."""
+        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.model_id = "gemini-2.5-flash-lite"
+        self._http: httpx.AsyncClient | None = None
+        # Gemini parts for hot CIDs, bounded by total image bytes
+        self._part_cache: LRUCache = LRUCache(
+            maxsize=settings.IPFS_PART_CACHE_BYTES,
+            getsizeof=lambda part: len(part.inline_data.data)
+        )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared HTTP/2 client so IPFS downloads reuse pooled connections."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+        return self._http
+
+    def open(self) -> httpx.AsyncClient:
+        """Create the shared HTTP client up front so the first request skips setup."""
+        return self.http
+
+    async def close(self):
+        """Close the shared HTTP client; it is recreated on next use."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def get_prompt(self, expected: str) -> str:
+        """Generate the per-request prompt; the rules live in the system instruction."""
+        return "Expected: " + expected
 
     async def get_image(self, hash: str) -> tuple[bytes, str]:
-        # Prefer Cloudflare IPFS gateway which is generally script-friendly/CORS-friendly.
-        # Accept hashes with or without "ipfs://" or "/ipfs/" prefixes.
+        """Download image bytes and MIME type for a bare IPFS CID."""
         ipfs_hash = hash
-        if ipfs_hash.startswith("ipfs://"):
-            ipfs_hash = ipfs_hash[len("ipfs://"):]
-        if ipfs_hash.startswith("/ipfs/"):
-            ipfs_hash = ipfs_hash[len("/ipfs/"):]
-        # Try multiple public IPFS gateways as fallback (Cloudflare may not resolve)
-        gateways = [
-            "https://cloudflare-ipfs.com/ipfs/{}",
-            "https://ipfs.io/ipfs/{}",
-            "https://dweb.link/ipfs/{}",
-            "https://gateway.pinata.cloud/ipfs/{}",
-        ]
+
+        # IPFS content is addressed by CID, so a cached copy never goes stale
+        cache_key = f"ipfs:{ipfs_hash}"
+        # Shielded here and below: a prefetch cancelled on a cache hit must not
+        # interrupt a Redis command, which would drop the pooled connection
+        cached = await asyncio.shield(redis_client.get_bytes(cache_key))
+        if cached:
+            mime, _, image_bytes = cached.partition(b"\x00")
+            return image_bytes, mime.decode()
+
+        # Hedged race: start with the first gateway and fan out to the next one
+        # whenever the in-flight requests fail or stay silent for the hedge delay
+        tasks: list[asyncio.Task] = []
+        pending: set[asyncio.Task] = set()
+        gateways = iter(IPFS_GATEWAYS)
         last_exc = None
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                for gw in gateways:
-                    url = gw.format(ipfs_hash)
-                    try:
-                        resp = await client.get(url)
-                        resp.raise_for_status()
-                        image_bytes: bytes = resp.content
-                        mime_type = resp.headers.get(
-                            'content-type', 'application/octet-stream')
+            while True:
+                gw = next(gateways, None)
+                if gw is not None:
+                    task = asyncio.create_task(self._fetch(gw.format(ipfs_hash)))
+                    tasks.append(task)
+                    pending.add(task)
+                elif not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=settings.IPFS_HEDGE_DELAY if gw is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        image_bytes, mime_type = task.result()
+                        # Keep very large images out of Redis memory
+                        if len(image_bytes) <= settings.IPFS_CACHE_MAX_BYTES:
+                            await asyncio.shield(redis_client.set_bytes(
+                                cache_key,
+                                mime_type.encode() + b"\x00" + image_bytes,
+                                settings.IPFS_CACHE_TTL
+                            ))
                         return image_bytes, mime_type
-                    except Exception as e:
-                        last_exc = e
-                        # try next gateway
-            # If we reach here no gateway succeeded
-            tried = ", ".join(gateways)
-            raise Exception(
-                f"Failed to download image for hash {ipfs_hash} from gateways: {tried}; last error: {last_exc}")
-        except Exception as e:
-            raise Exception(
-                f"Failed to download image from IPFS gateways for {ipfs_hash}: {e}")
+                    last_exc = task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # If we reach here no gateway succeeded
+        tried = ", ".join(IPFS_GATEWAYS)
+        raise IPFSDownloadError(
+            f"Failed to download image for hash {ipfs_hash} from gateways: {tried}; last error: {last_exc}"
+        ) from last_exc
+
+    async def _fetch(self, url: str) -> tuple[bytes, str]:
+        """Fetch a single gateway URL and return its body and content type."""
+        max_bytes = settings.IPFS_MAX_IMAGE_BYTES
+        async with self.http.stream("GET", url) as resp:
+            resp.raise_for_status()
+            mime_type = resp.headers.get('content-type', 'application/octet-stream')
+            if not mime_type.startswith('image/'):
+                raise IPFSDownloadError(f"Gateway returned {mime_type} for {url}, not an image")
+            declared = int(resp.headers.get('content-length') or 0)
+            if declared > max_bytes:
+                raise IPFSDownloadError(f"Image at {url} exceeds {max_bytes} bytes")
+
+            # Fill one buffer sized from Content-Length instead of regrowing it
+            buf = bytearray(declared)
+            size = 0
+            async for chunk in resp.aiter_bytes(65536):
+                end = size + len(chunk)
+                if end > max_bytes:
+                    raise IPFSDownloadError(f"Image at {url} exceeds {max_bytes} bytes")
+                buf[size:end] = chunk
+                size = end
+            del buf[size:]
+            return bytes(buf), mime_type
 
     async def download_image(self, hash: str) -> types.Part:
         """Download image from IPFS and return as Gemini Part."""
+        part = self._part_cache.get(hash)
+        if part is not None:
+            return part
+
         image_bytes, mime_type = await self.get_image(hash)
-        return types.Part.from_bytes(
+        return self._store_part(hash, image_bytes, mime_type)
+
+    def _store_part(self, hash: str, image_bytes: bytes, mime_type: str) -> types.Part:
+        """Wrap image bytes in a Gemini Part and keep it in the part cache."""
+        part = types.Part.from_bytes(
             data=image_bytes,
             mime_type=mime_type,
         )
+        if len(image_bytes) <= self._part_cache.maxsize:
+            self._part_cache[hash] = part
+        return part
+
+    async def download_images(self, hashes: list[str]) -> list[types.Part]:
+        """Download several images concurrently; latency is the slowest single fetch."""
+        missing = [h for h in dict.fromkeys(hashes) if h not in self._part_cache]
+        if len(missing) > 1:
+            # Probe the Redis image cache for all of them with one MGET
+            cached = await asyncio.shield(
+                redis_client.get_many_bytes([f"ipfs:{h}" for h in missing])
+            )
+            for hash, value in zip(missing, cached):
+                if value:
+                    mime, _, image_bytes = value.partition(b"\x00")
+                    self._store_part(hash, image_bytes, mime.decode())
+        return list(await asyncio.gather(*(self.download_image(h) for h in hashes)))
 
-    async def generate_response(self, hashes: list[str], expected_value: str) -> Tuple[Literal['MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN'], str]:
+    async def generate_response(
+        self,
+        hashes: list[str],
+        expected_value: str,
+        parts: list[types.Part] | None = None
+    ) -> Tuple[Literal['MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN'], str]:
         """
         Generate response from Gemini API with custom prompt.
 
         Args:
-            hash_value: Hash identifier from request
+            hashes: Bare IPFS CIDs of the images to analyze
             expected_value: Expected value from request
+            parts: Image parts already downloaded for `hashes`, if prefetched
 
         Returns:
             Tuple of (badge, details) where badge is one of 'MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN'
             and details is the analysis text from Gemini
         """
 
-        contents: types.ContentListUnion = [await self.download_image(h) for h in hashes]
+        if parts is None:
+            parts = await self.download_images(hashes)
+        contents: types.ContentListUnion = list(parts)
         prompt = self.get_prompt(expected_value)
         contents.append(prompt)
 
         try:
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
-                contents=contents
+                contents=contents,
+                config=_GENERATE_CONFIG
             )
 
             # Extract text from response
             if response.text:
-                response_text = response.text.strip()
-
-                # Parse the response to extract badge and details
-                badge: Literal['MATCHS WITH DESCRIPTION',
-                               'NEEDS REVISION', 'UNKNOWN'] = 'UNKNOWN'
-                details = response_text
-
-                # Split into non-empty lines and prefer the format:
-                # DETAILS: <...>  (first line)
-                # CLASSIFICATION: <MATCHS WITH DESCRIPTION|NEEDS REVISION|UNKNOWN>  (second line)
-                lines = [l.strip()
-                         for l in response_text.splitlines() if l.strip()]
-
-                parsed = False
-                if len(lines) >= 2 and lines[0].upper().startswith('DETAILS:') and lines[1].upper().startswith('CLASSIFICATION:'):
-                    details = lines[0].split(':', 1)[1].strip()
-                    classification = lines[1].split(':', 1)[1].strip().upper()
-                    if 'MATCHS WITH DESCRIPTION' in classification and 'NEEDS REVISION' not in classification:
-                        badge = 'MATCHS WITH DESCRIPTION'
-                    elif 'NEEDS REVISION' in classification:
-                        badge = 'NEEDS REVISION'
-                    else:
-                        badge = 'UNKNOWN'
-                    parsed = True
-
-                if not parsed:
-                    # Try to find a DETAILS line followed by a later CLASSIFICATION line
-                    details_candidate = None
-                    classification_candidate = None
-                    for i, line in enumerate(lines):
-                        up = line.upper()
-                        if up.startswith('DETAILS:') and details_candidate is None:
-                            details_candidate = line.split(':', 1)[1].strip()
-                            # look for CLASSIFICATION in subsequent lines
-                            for j in range(i + 1, len(lines)):
-                                upj = lines[j].upper()
-                                if upj.startswith('CLASSIFICATION:'):
-                                    classification_candidate = lines[j].split(':', 1)[
-                                        1].strip().upper()
-                                    break
-                            if classification_candidate:
-                                break
-
-                    if details_candidate and classification_candidate:
-                        details = details_candidate
-                        if 'MATCHS WITH DESCRIPTION' in classification_candidate and 'NEEDS REVISION' not in classification_candidate:
-                            badge = 'MATCHS WITH DESCRIPTION'
-                        elif 'NEEDS REVISION' in classification_candidate:
-                            badge = 'NEEDS REVISION'
-                        else:
-                            badge = 'UNKNOWN'
-                        parsed = True
-
-                if not parsed:
-                    # Fallback: detect keywords anywhere in the response
-                    response_upper = response_text.upper()
-                    if 'MATCHS WITH DESCRIPTION' in response_upper and 'NEEDS REVISION' not in response_upper:
-                        badge = 'MATCHS WITH DESCRIPTION'
-                    elif 'NEEDS REVISION' in response_upper:
-                        badge = 'NEEDS REVISION'
-                    else:
-                        badge = 'UNKNOWN'
-
-                return badge, details
+                return self.parse_response(response.text.strip())
             else:
                 return 'UNKNOWN', "No response generated from Gemini API"
 
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
 
+    def parse_response(self, response_text: str) -> Tuple[Literal['MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN'], str]:
+        """
+        Parse badge and details from Gemini response text.
+
+        Prefers a DETAILS line followed (possibly after other lines) by a
+        CLASSIFICATION line; otherwise detects the badge keywords anywhere in
+        the text and returns the whole text as details.
+
+        Args:
+            response_text: Stripped response text from Gemini
+
+        Returns:
+            Tuple of (badge, details)
+        """
+        match = _RESPONSE_RE.search(response_text)
+        if match and match['details']:
+            return _classify(match['cls']), match['details']
+        return _classify(response_text), response_text
+
+
+def _classify(text: str) -> Literal['MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN']:
+    """Map classification text to a badge value."""
+    badge = 'UNKNOWN'
+    # NEEDS REVISION wins wherever it appears, so stop scanning at the first one
+    for match in _BADGE_RE.finditer(text):
+        if match[1]:
+            return 'NEEDS REVISION'
+        badge = 'MATCHS WITH DESCRIPTION'
+    return badge
+
+
+@lru_cache(maxsize=1)
+def get_gemini_service() -> GeminiService:
+    """Return the process-wide GeminiService instance."""
+    return GeminiService()
+
 
 # Global Gemini service instance
-gemini_service = GeminiService()
+gemini_service = get_gemini_service()
@@ -1,13 +1,17 @@
 """FastAPI application main module."""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 
-from app.database import init_db
+from app.database import init_db, close_db
 from app.config import settings
-from app.controllers import router
+from app.controllers import router, prewarm_cache
+from app.gemini_service import gemini_service
+from app.redis_client import redis_client
 from app.middleware import (
     error_handler_middleware,
     validation_exception_handler,
@@ -18,10 +22,19 @@ from app.middleware import (
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
-    # Startup: Initialize database
-    init_db()
+    # Startup: Initialize database and warm caches in the background
+    await init_db()
+    gemini_service.open()
+    prewarm_task = asyncio.create_task(prewarm_cache())
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop prewarming and release pooled connections
+    prewarm_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await prewarm_task
+    await redis_client.flush_writes()
+    await redis_client.close()
+    await gemini_service.close()
+    await close_db()
 
 
 # Create FastAPI application
@@ -30,6 +43,7 @@ app = FastAPI(
     description="FastAPI service that calls Gemini API with Redis and PostgreSQL caching",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc"
 )
@@ -1,8 +1,7 @@
 """Middleware for error handling and RFC 9457 problem details."""
 import logging
-from typing import Union
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from pydantic import BaseModel, ConfigDict
@@ -10,6 +9,18 @@ from pydantic import BaseModel, ConfigDict
 
 logger = logging.getLogger(__name__)
 
+# Problem type URI and title for each status code with a dedicated mapping
+_STATUS_PROBLEMS: dict[int, tuple[str, str]] = {
+    status.HTTP_400_BAD_REQUEST: ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.1", "Bad Request"),
+    status.HTTP_401_UNAUTHORIZED: ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.2", "Unauthorized"),
+    status.HTTP_403_FORBIDDEN: ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.4", "Forbidden"),
+    status.HTTP_404_NOT_FOUND: ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.5", "Not Found"),
+    status.HTTP_422_UNPROCESSABLE_ENTITY: ("https://datatracker.ietf.org/doc/html/rfc4918#section-11.2", "Unprocessable Entity"),
+    status.HTTP_503_SERVICE_UNAVAILABLE: ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.4", "Service Unavailable"),
+}
+_SERVER_ERROR_PROBLEM = ("https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.1", "Internal Server Error")
+_VALIDATION_ERROR_TYPE = "https://datatracker.ietf.org/doc/html/rfc4918#section-11.2"
+
 
 class ProblemDetail(BaseModel):
     """RFC 9457 Problem Details for HTTP APIs.
@@ -36,6 +47,61 @@ class ProblemDetail(BaseModel):
     instance: str
 
 
+def problem_type(status_code: int, default_title: str) -> tuple[str, str]:
+    """
+    Look up the RFC 9457 problem type and title for a status code.
+
+    Args:
+        status_code: HTTP status code of the error
+        default_title: Title used when the code has no dedicated mapping
+
+    Returns:
+        Tuple of (type URI, title)
+    """
+    problem = _STATUS_PROBLEMS.get(status_code)
+    if problem is not None:
+        return problem
+    if status_code >= 500:
+        return _SERVER_ERROR_PROBLEM
+    return "about:blank", default_title
+
+
+def problem_response(
+    request: Request,
+    status_code: int,
+    error_type: str,
+    title: str,
+    detail: str
+) -> ORJSONResponse:
+    """
+    Build an RFC 9457 problem details response.
+
+    The body has the ProblemDetail shape; it is built as a plain dict since
+    every field is produced here and needs no validation.
+
+    Args:
+        request: The incoming request
+        status_code: HTTP status code
+        error_type: Problem type URI
+        title: Short summary of the problem type
+        detail: Explanation specific to this occurrence
+
+    Returns:
+        ORJSONResponse with RFC 9457 problem details
+    """
+    return ORJSONResponse(
+        status_code=status_code,
+        content={
+            "type": error_type,
+            "title": title,
+            "status": status_code,
+            "detail": detail,
+            "instance": request.url.path
+        },
+        headers={"Content-Type": "application/problem+json"}
+    )
+
+
 async def error_handler_middleware(request: Request, call_next):
     """
     Middleware to handle all errors and format them according to RFC 9457.
@@ -50,7 +116,7 @@ async def error_handler_middleware(request: Request, call_next):
         return await handle_exception(request, exc)
 
 
-async def handle_exception(request: Request, exc: Exception) -> JSONResponse:
+async def handle_exception(request: Request, exc: Exception) -> ORJSONResponse:
     """
     Handle exceptions and return RFC 9457 compliant error response.
     
@@ -59,7 +125,7 @@ async def handle_exception(request: Request, exc: Exception) -> JSONResponse:
         exc: The exception that was raised
         
     Returns:
-        JSONResponse with RFC 9457 problem details
+        ORJSONResponse with RFC 9457 problem details
     """
     # Default values
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -70,69 +136,32 @@ async def handle_exception(request: Request, exc: Exception) -> JSONResponse:
     # Handle specific exception types
     if isinstance(exc, StarletteHTTPException):
         status_code = exc.status_code
-        detail = exc.detail
-        
-        # Map status codes to appropriate types and titles
-        if status_code == status.HTTP_400_BAD_REQUEST:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.1"
-            title = "Bad Request"
-        elif status_code == status.HTTP_401_UNAUTHORIZED:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.2"
-            title = "Unauthorized"
-        elif status_code == status.HTTP_403_FORBIDDEN:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.4"
-            title = "Forbidden"
-        elif status_code == status.HTTP_404_NOT_FOUND:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.5"
-            title = "Not Found"
-        elif status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc4918#section-11.2"
-            title = "Unprocessable Entity"
-        elif status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.4"
-            title = "Service Unavailable"
-        elif status_code >= 500:
-            error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.1"
-            title = "Internal Server Error"
+        detail = exc.detail if isinstance(exc.detail, str) else str(exc.detail)
+        error_type, title = problem_type(status_code, title)
             
     elif isinstance(exc, RequestValidationError):
         status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
-        error_type = "https://datatracker.ietf.org/doc/html/rfc4918#section-11.2"
+        error_type = _VALIDATION_ERROR_TYPE
         title = "Validation Error"
         detail = f"Request validation failed: {str(exc)}"
     
     # Check if it's a Gemini API error (return 503)
-    elif "Gemini API error" in str(exc) or "Failed to call Gemini API" in str(exc):
+    elif "Gemini API error" in detail or "Failed to call Gemini API" in detail:
         status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.4"
-        title = "Service Unavailable"
+        error_type, title = _STATUS_PROBLEMS[status_code]
         detail = "Gemini API is currently unavailable"
-        logger.error(f"Gemini API error: {str(exc)}")
+        logger.error("Gemini API error: %s", exc)
     
     # Log the error
     logger.error(
-        f"Error handling request {request.method} {request.url.path}: "
-        f"{exc.__class__.__name__}: {str(exc)}"
+        "Error handling request %s %s: %s: %s",
+        request.method, request.url.path, exc.__class__.__name__, exc
     )
     
-    # Create RFC 9457 problem details
-    problem = ProblemDetail(
-        type=error_type,
-        title=title,
-        status=status_code,
-        detail=detail,
-        instance=str(request.url.path)
-    )
-    
-    # Return JSON response with problem details
-    return JSONResponse(
-        status_code=status_code,
-        content=problem.model_dump(),
-        headers={"Content-Type": "application/problem+json"}
-    )
+    return problem_response(request, status_code, error_type, title, detail)
 
 
-def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+def validation_exception_handler(request: Request, exc: RequestValidationError) -> ORJSONResponse:
     """
     Handle validation errors and return RFC 9457 compliant response.
     
@@ -141,7 +170,7 @@ def validation_exception_handler(request: Request, exc: RequestValidationError)
         exc: The validation error
         
     Returns:
-        JSONResponse with RFC 9457 problem details
+        ORJSONResponse with RFC 9457 problem details
     """
     # Format validation errors
     errors = []
@@ -151,24 +180,18 @@ def validation_exception_handler(request: Request, exc: RequestValidationError)
     
     detail = "; ".join(errors)
     
-    problem = ProblemDetail(
-        type="https://datatracker.ietf.org/doc/html/rfc4918#section-11.2",
-        title="Validation Error",
-        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        detail=detail,
-        instance=str(request.url.path)
-    )
-    
-    logger.warning(f"Validation error on {request.url.path}: {detail}")
+    logger.warning("Validation error on %s: %s", request.url.path, detail)
     
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content=problem.model_dump(),
-        headers={"Content-Type": "application/problem+json"}
+    return problem_response(
+        request,
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        _VALIDATION_ERROR_TYPE,
+        "Validation Error",
+        detail
     )
 
 
-def http_exception_handler(request: Request, exc: StarletteHTTPException) -> JSONResponse:
+def http_exception_handler(request: Request, exc: StarletteHTTPException) -> ORJSONResponse:
     """
     Handle HTTP exceptions and return RFC 9457 compliant response.
     
@@ -177,47 +200,13 @@ def http_exception_handler(request: Request, exc: StarletteHTTPException) -> JSO
         exc: The HTTP exception
         
     Returns:
-        JSONResponse with RFC 9457 problem details
+        ORJSONResponse with RFC 9457 problem details
     """
     # Map status codes to RFC 9110 references
     status_code = exc.status_code
-    error_type = "about:blank"
-    title = "HTTP Error"
-    
-    if status_code == status.HTTP_400_BAD_REQUEST:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.1"
-        title = "Bad Request"
-    elif status_code == status.HTTP_401_UNAUTHORIZED:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.2"
-        title = "Unauthorized"
-    elif status_code == status.HTTP_403_FORBIDDEN:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.4"
-        title = "Forbidden"
-    elif status_code == status.HTTP_404_NOT_FOUND:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.5.5"
-        title = "Not Found"
-    elif status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc4918#section-11.2"
-        title = "Unprocessable Entity"
-    elif status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.4"
-        title = "Service Unavailable"
-    elif status_code >= 500:
-        error_type = "https://datatracker.ietf.org/doc/html/rfc9110#section-15.6.1"
-        title = "Internal Server Error"
-    
-    problem = ProblemDetail(
-        type=error_type,
-        title=title,
-        status=status_code,
-        detail=exc.detail if isinstance(exc.detail, str) else str(exc.detail),
-        instance=str(request.url.path)
-    )
+    error_type, title = problem_type(status_code, "HTTP Error")
+    detail = exc.detail if isinstance(exc.detail, str) else str(exc.detail)
     
-    logger.info(f"HTTP {status_code} on {request.url.path}: {exc.detail}")
+    logger.info("HTTP %s on %s: %s", status_code, request.url.path, exc.detail)
     
-    return JSONResponse(
-        status_code=status_code,
-        content=problem.model_dump(),
-        headers={"Content-Type": "application/problem+json"}
-    )
+    return problem_response(request, status_code, error_type, title, detail)
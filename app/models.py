@@ -1,40 +1,44 @@
 """Pydantic models for API request/response."""
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal
+from typing import Annotated, Final, Literal
+
+
+# IPFS reference: optional "ipfs://" or "/ipfs/" prefix and a single path-safe
+# CID segment. Compiled once by pydantic-core's linear-time regex engine; also
+# keeps "/", "?", "#" and ".." out of the gateway URLs built from it.
+IpfsHash = Annotated[str, Field(pattern=r"^(?:ipfs://|/ipfs/)?[A-Za-z0-9_-]+$")]
+
+
+# OpenAPI examples, shared by the model configs below
+_REQUEST_EXAMPLE: Final[dict] = {
+    "workId": "gig-0-1-1",
+    "hashes": [
+        "ipfs://bafybeihdwdcefgh4dqkjv67uzcmwiyje6z4g3d5y5r3g4a3g5j6e6q7e",
+        "ipfs://bafybeibwzif3c4x5y6z7a8b9c0d1e2f3g4h5i6j7k8l9m0n1o2p3q4r5s"
+    ],
+    "expected": "some expected value"
+}
+_RESPONSE_EXAMPLE: Final[dict] = {
+    "badge": "MATCHS WITH DESCRIPTION",
+    "details": "Analysis details from Gemini API"
+}
 
 
 class GeminiRequest(BaseModel):
     """Request model for Gemini API endpoint."""
 
-    model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "workId": "gig-0-1-1",
-                "hashes": [
-                    "ipfs://bafybeihdwdcefgh4dqkjv67uzcmwiyje6z4g3d5y5r3g4a3g5j6e6q7e",
-                    "ipfs://bafybeibwzif3c4x5y6z7a8b9c0d1e2f3g4h5i6j7k8l9m0n1o2p3q4r5s"
-                ],
-                "expected": "some expected value"
-            }
-        }
-    )
+    # Requests are read-only once validated
+    model_config = ConfigDict(json_schema_extra={"example": _REQUEST_EXAMPLE}, frozen=True)
 
     workId: str = Field(..., description="Work ID for the request")
-    hashes: list[str] = Field(..., description="List of ipfs hash identifiers")
+    hashes: list[IpfsHash] = Field(..., description="List of ipfs hash identifiers")
     expected: str = Field(..., description="Expected value or context")
 
 
 class GeminiResponse(BaseModel):
     """Response model for Gemini API endpoint."""
 
-    model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "badge": "MATCHS WITH DESCRIPTION",
-                "details": "Analysis details from Gemini API"
-            }
-        }
-    )
+    model_config = ConfigDict(json_schema_extra={"example": _RESPONSE_EXAMPLE})
 
     badge: Literal['MATCHS WITH DESCRIPTION', 'NEEDS REVISION', 'UNKNOWN'] = Field(
         ...,
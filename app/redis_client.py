@@ -1,6 +1,9 @@
 """Redis client configuration."""
 import redis.asyncio as redis
-import json
+import orjson
+import zstandard as zstd
+from cachetools import TTLCache
+from hashlib import blake2b
 import logging
 import asyncio
 from typing import Optional
@@ -8,50 +11,136 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Cached JSON values are framed by a one-byte marker: zstd-compressed or raw
+_ZSTD = b"Z"
+_RAW = b"R"
+# Payloads smaller than this are not worth compressing
+_COMPRESS_MIN_BYTES = 512
+# Longer keys (e.g. ipfs:<CID>) are stored under a 16-byte digest instead
+_MAX_PLAIN_KEY_BYTES = 32
+# Response entries get their own prefix so a workId can never name another
+# kind of key, such as an ipfs:<CID> image blob
+_ENTRY_PREFIX = "g:"
+
+
+def redis_key(key: str) -> bytes:
+    """
+    Map a cache key to the key stored in Redis.
+
+    Short keys such as workIds are kept readable; long ones are replaced by
+    an ``h:``-prefixed 16-byte BLAKE2b digest to shrink the keyspace.
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Key as stored in Redis
+    """
+    raw = key.encode()
+    if len(raw) <= _MAX_PLAIN_KEY_BYTES:
+        return raw
+    return b"h:" + blake2b(raw, digest_size=16).digest()
+
+
+def entry_key(key: str) -> bytes:
+    """
+    Map a response cache key (workId) to the key stored in Redis.
+
+    Args:
+        key: Cache key (workId)
+
+    Returns:
+        Key as stored in Redis
+    """
+    return redis_key(_ENTRY_PREFIX + key)
+
 
 class RedisClient:
     """Redis client for caching Gemini API responses."""
 
     def __init__(self):
-        """Initialize Redis connection config."""
-        self._host = settings.REDIS_HOST
-        self._port = settings.REDIS_PORT
-        self._db = settings.REDIS_DB
-        self._user = settings.REDIS_USER
-        self._password = settings.REDIS_PASSWORD
-        self._url = settings.REDIS_URL
-        self._client_cache = {}
+        """Initialize client state; connection settings are read per pool."""
+        # One client (and connection pool) per event loop; pooled connections
+        # are bound to the loop that opened them
+        self._client_cache: dict[Optional[asyncio.AbstractEventLoop], redis.Redis] = {}
+        # Write-behind buffer of key -> (value, expire), drained by _flush_task
+        self._write_buffer: dict[str, tuple[dict, int]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Process-local tier in front of Redis, holding response bodies already
+        # encoded as JSON (~1KB per entry, ~10MB at 10k entries)
+        self.local: TTLCache = TTLCache(
+            maxsize=settings.CACHE_L1_MAXSIZE, ttl=settings.CACHE_L1_TTL
+        )
+        self._cctx = zstd.ZstdCompressor(level=3)
+        self._dctx = zstd.ZstdDecompressor()
+
+    def _encode(self, value: dict) -> bytes:
+        """Serialize a value, compressing large payloads with zstd."""
+        raw = orjson.dumps(value)
+        if len(raw) > _COMPRESS_MIN_BYTES:
+            return _ZSTD + self._cctx.compress(raw)
+        return _RAW + raw
+
+    def _json_bytes(self, data: bytes) -> bytes:
+        """Unwrap the JSON document of a value written by `_encode` (or plain JSON from older entries)."""
+        marker = data[:1]
+        if marker == _ZSTD:
+            return self._dctx.decompress(data[1:])
+        if marker == _RAW:
+            return data[1:]
+        return data
+
+    def _decode(self, data: bytes) -> dict:
+        """Deserialize a value written by `_encode`."""
+        return orjson.loads(self._json_bytes(data))
+
+    def _create_client(self) -> redis.Redis:
+        """Create a Redis client backed by a bounded, blocking connection pool."""
+        if settings.REDIS_URL:
+            pool = redis.BlockingConnectionPool.from_url(
+                settings.REDIS_URL, max_connections=settings.REDIS_POOL_SIZE
+            )
+        else:
+            if settings.REDIS_UNIX_SOCKET:
+                # Colocated Redis: skip the TCP/IP stack entirely
+                kwargs = {
+                    "connection_class": redis.UnixDomainSocketConnection,
+                    "path": settings.REDIS_UNIX_SOCKET,
+                    "db": settings.REDIS_DB
+                }
+            else:
+                # redis-py already sets TCP_NODELAY on every TCP connection
+                kwargs = {
+                    "host": settings.REDIS_HOST,
+                    "port": settings.REDIS_PORT,
+                    "db": settings.REDIS_DB,
+                    "socket_keepalive": True
+                }
+            if settings.REDIS_USER:
+                kwargs["username"] = settings.REDIS_USER
+            if settings.REDIS_PASSWORD:
+                kwargs["password"] = settings.REDIS_PASSWORD
+            pool = redis.BlockingConnectionPool(
+                max_connections=settings.REDIS_POOL_SIZE, **kwargs
+            )
+        return redis.Redis(connection_pool=pool)
 
     def _get_client(self) -> redis.Redis:
         """Get or create Redis client for current event loop."""
         try:
             loop = asyncio.get_running_loop()
-            loop_id = id(loop)
         except RuntimeError:
             # No event loop running, use a default client
             # This should only happen in synchronous contexts
-            loop_id = 0
-
-        if loop_id not in self._client_cache:
-            if self._url:
-                self._client_cache[loop_id] = redis.from_url(
-                    self._url,
-                    decode_responses=True
-                )
-            else:
-                kwargs = {
-                    "host": self._host,
-                    "port": self._port,
-                    "db": self._db,
-                    "decode_responses": True
-                }
-                if self._user:
-                    kwargs["username"] = self._user
-                if self._password:
-                    kwargs["password"] = self._password
+            loop = None
 
-                self._client_cache[loop_id] = redis.Redis(**kwargs)
-        return self._client_cache[loop_id]
+        client = self._client_cache.get(loop)
+        if client is None:
+            # Drop clients of loops that have since closed so they can be freed
+            for stale in [l for l in self._client_cache if l is not None and l.is_closed()]:
+                del self._client_cache[stale]
+            client = self._client_cache[loop] = self._create_client()
+        return client
 
     def get_client(self) -> redis.Redis:
         """Public method to get Redis client for testing purposes."""
@@ -69,12 +158,51 @@ class RedisClient:
         """
         try:
             client = self._get_client()
-            cached_data = await client.get(key)
+            cached_data = await client.get(entry_key(key))
+            if cached_data:
+                return self._decode(cached_data)
+            return None
+        except Exception as e:
+            logger.error("Redis get error: %s", e)
+            return None
+
+    async def get_and_touch(self, key: str, expire: int = 3600) -> Optional[dict]:
+        """
+        Retrieve cached response and refresh its TTL in the same round-trip.
+
+        Args:
+            key: Cache key (hash)
+            expire: New expiration time in seconds (default: 1 hour)
+
+        Returns:
+            Cached response dict or None
+        """
+        cached_json = await self.get_json_and_touch(key, expire)
+        return orjson.loads(cached_json) if cached_json else None
+
+    async def get_json_and_touch(self, key: str, expire: int = 3600) -> Optional[bytes]:
+        """
+        Retrieve a cached response as JSON bytes and refresh its TTL.
+
+        Uses GETEX so hot entries keep sliding forward without a separate
+        EXPIRE command. The JSON is returned unparsed so it can be sent to
+        the client as-is.
+
+        Args:
+            key: Cache key (hash)
+            expire: New expiration time in seconds (default: 1 hour)
+
+        Returns:
+            Cached response JSON or None
+        """
+        try:
+            client = self._get_client()
+            cached_data = await client.getex(entry_key(key), ex=expire)
             if cached_data:
-                return json.loads(cached_data)
+                return self._json_bytes(cached_data)
             return None
         except Exception as e:
-            logger.error(f"Redis get error: {e}")
+            logger.error("Redis get error: %s", e)
             return None
 
     async def set_cache(self, key: str, value: dict, expire: int = 3600):
@@ -88,27 +216,146 @@ class RedisClient:
         """
         try:
             client = self._get_client()
-            await client.setex(key, expire, json.dumps(value))
+            await client.setex(entry_key(key), expire, self._encode(value))
+        except Exception as e:
+            logger.error("Redis set error: %s", e)
+
+    async def set_many(self, items: dict[str, dict], expire: int = 3600):
+        """
+        Store several responses in Redis cache in one pipelined round-trip.
+
+        Args:
+            items: Mapping of cache key (hash) to response data
+            expire: Expiration time in seconds (default: 1 hour)
+        """
+        if not items:
+            return
+        try:
+            client = self._get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(entry_key(key), expire, self._encode(value))
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Redis pipeline set error: %s", e)
+
+    def queue_cache(self, key: str, value: dict, expire: int = 3600):
+        """
+        Queue a response for a write-behind store in Redis cache.
+
+        Returns immediately; writes queued within REDIS_WRITE_BATCH_DELAY of
+        each other are sent together in pipelined batches. Like the
+        PostgreSQL insert, the first value stored for a key wins: later
+        writes for a key that is already cached are dropped.
+
+        Args:
+            key: Cache key (hash)
+            value: Response data to cache
+            expire: Expiration time in seconds (default: 1 hour)
+        """
+        self._write_buffer.setdefault(key, (value, expire))
+        task = self._flush_task
+        # A task left pending on a closed loop will never run again
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._flush_task = asyncio.create_task(self._flush_writes())
+
+    async def flush_writes(self):
+        """Wait until queued cache writes have been sent to Redis."""
+        task = self._flush_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            await task
+
+    async def _flush_writes(self):
+        """Drain the write-behind buffer into Redis pipelines."""
+        await asyncio.sleep(settings.REDIS_WRITE_BATCH_DELAY)
+        while self._write_buffer:
+            batch = {}
+            while self._write_buffer and len(batch) < settings.REDIS_WRITE_BATCH_SIZE:
+                key = next(iter(self._write_buffer))
+                batch[key] = self._write_buffer.pop(key)
+            try:
+                client = self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, (value, expire) in batch.items():
+                        # SET NX EX: one atomic command, never overwrites an entry
+                        pipe.set(entry_key(key), self._encode(value), ex=expire, nx=True)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error("Redis pipeline set error: %s", e)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Retrieve a raw binary value from Redis.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Stored bytes or None
+        """
+        try:
+            client = self._get_client()
+            return await client.get(redis_key(key))
+        except Exception as e:
+            logger.error("Redis get error: %s", e)
+            return None
+
+    async def get_many_bytes(self, keys: list[str]) -> list[Optional[bytes]]:
+        """
+        Retrieve several raw binary values from Redis with a single MGET.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Stored bytes or None for each key, in order
+        """
+        try:
+            client = self._get_client()
+            return await client.mget([redis_key(key) for key in keys])
+        except Exception as e:
+            logger.error("Redis mget error: %s", e)
+            return [None] * len(keys)
+
+    async def set_bytes(self, key: str, value: bytes, expire: int):
+        """
+        Store a raw binary value in Redis.
+
+        Args:
+            key: Cache key
+            value: Bytes to store as-is
+            expire: Expiration time in seconds
+        """
+        try:
+            client = self._get_client()
+            await client.setex(redis_key(key), expire, value)
         except Exception as e:
-            logger.error(f"Redis set error: {e}")
+            logger.error("Redis set error: %s", e)
 
     async def delete_cache(self, key: str):
         """
-        Delete cached response from Redis.
+        Delete cached response from Redis and the in-process tier.
 
         Args:
             key: Cache key (hash)
         """
+        self.local.pop(key, None)
         try:
             client = self._get_client()
-            await client.delete(key)
+            await client.delete(entry_key(key))
         except Exception as e:
-            logger.error(f"Redis delete error: {e}")
+            logger.error("Redis delete error: %s", e)
+
+    async def close(self):
+        """Close the Redis client and connection pool of the current event loop."""
+        client = self._client_cache.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose(close_connection_pool=True)
 
     async def close_all(self):
         """Close all Redis connections."""
         for client in self._client_cache.values():
-            await client.aclose()
+            await client.aclose(close_connection_pool=True)
         self._client_cache.clear()
 
 
@@ -1,6 +1,11 @@
 """Tests for API controllers."""
+import asyncio
+import orjson
 import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.controllers import call_gemini, prewarm_cache, store_cache_entry, _l1
 from app.database import GeminiCache
+from app.models import GeminiRequest
 
 
 def test_root_endpoint(client):
@@ -45,9 +50,7 @@ def test_gemini_endpoint_with_mock(client, mock_gemini_service, clean_redis, tes
     mock_gemini_service.generate_response.assert_called_once()
     
     # Verify data was stored in database
-    cached_entry = test_db_session.query(GeminiCache).filter(
-        GeminiCache.id == "gig-0-1-1"
-    ).first()
+    cached_entry = test_db_session.get(GeminiCache, "gig-0-1-1")
     assert cached_entry is not None
     assert cached_entry.badge == "MATCHS WITH DESCRIPTION"
     assert cached_entry.details == "Test analysis details"
@@ -83,6 +86,19 @@ def test_gemini_endpoint_unknown_response(client, mock_gemini_service, clean_red
     assert data["details"] == "Unable to classify"
 
 
+def test_gemini_endpoint_rejects_invalid_gemini_badge(client, mock_gemini_service, clean_redis, test_db_session):
+    """Test a badge outside the GeminiResponse literals is a 503 and is not cached."""
+    mock_gemini_service.generate_response.return_value = ("TRUSTED", "Not a valid badge")
+
+    response = client.post(
+        "/gemini",
+        json={"workId": "gig-0-1-20", "hashes": ["ipfs://invalid_badge_hash"], "expected": "value"}
+    )
+
+    assert response.status_code == 503
+    assert test_db_session.get(GeminiCache, "gig-0-1-20") is None
+
+
 def test_gemini_endpoint_cache_from_database(client, mock_gemini_service, clean_redis, test_db_session):
     """Test that cached data is retrieved from database."""
     # First, insert data directly into database
@@ -159,3 +175,188 @@ def test_multiple_requests_same_hash(client, mock_gemini_service, clean_redis, t
     # Both responses should have same data from cache
     assert response2.json()["badge"] == "MATCHS WITH DESCRIPTION"
     assert response2.json()["details"] == "First response"
+
+
+async def test_concurrent_misses_share_one_gemini_call(mock_gemini_service, clean_redis, test_db_session, app_session_factory):
+    """Test concurrent requests for the same uncached workId call Gemini once."""
+    async def slow_response(**kwargs):
+        await asyncio.sleep(0.05)
+        return ("MATCHS WITH DESCRIPTION", "Shared response")
+
+    mock_gemini_service.generate_response.side_effect = slow_response
+    request = GeminiRequest(workId="gig-0-1-10", hashes=["ipfs://herd_hash"], expected="herd")
+
+    response1, response2 = await asyncio.gather(call_gemini(request), call_gemini(request))
+
+    assert response1.body == response2.body
+    assert orjson.loads(response1.body)["details"] == "Shared response"
+    assert mock_gemini_service.generate_response.call_count == 1
+    mock_gemini_service.download_images.assert_awaited_once()
+
+
+async def test_cancelled_caller_does_not_cancel_shared_gemini_call(mock_gemini_service, clean_redis, test_db_session, app_session_factory):
+    """Test a waiter still gets the shared result when the request that started the call is cancelled."""
+    async def slow_response(**kwargs):
+        await asyncio.sleep(0.2)
+        return ("NEEDS REVISION", "Survives the leader")
+
+    mock_gemini_service.generate_response.side_effect = slow_response
+    request = GeminiRequest(workId="gig-0-1-18", hashes=["ipfs://leader_hash"], expected="value")
+
+    leader = asyncio.create_task(call_gemini(request))
+    await asyncio.sleep(0.05)
+    waiter = asyncio.create_task(call_gemini(request))
+    await asyncio.sleep(0.05)
+    leader.cancel()
+    response = await waiter
+
+    assert leader.cancelled()
+    assert orjson.loads(response.body)["details"] == "Survives the leader"
+    assert mock_gemini_service.generate_response.call_count == 1
+
+    # The entry is persisted even though its caller went away
+    from app.redis_client import redis_client
+    await redis_client.flush_writes()
+    assert (await redis_client.get_cache("gig-0-1-18"))["details"] == "Survives the leader"
+    assert test_db_session.get(GeminiCache, "gig-0-1-18").details == "Survives the leader"
+
+
+async def test_in_process_cache_serves_without_redis(client, mock_gemini_service, clean_redis, test_db_session):
+    """Test repeated workIds are served from the in-process cache tier."""
+    from app.redis_client import redis_client
+    mock_gemini_service.generate_response.return_value = ("NEEDS REVISION", "Local tier response")
+    payload = {"workId": "gig-0-1-11", "hashes": ["ipfs://local_hash"], "expected": "value"}
+
+    assert client.post("/gemini", json=payload).status_code == 200
+
+    # Drop the Redis and PostgreSQL copies; the in-process tier still answers
+    await redis_client.get_client().flushdb()
+    test_db_session.query(GeminiCache).filter(GeminiCache.id == "gig-0-1-11").delete()
+    test_db_session.commit()
+    response = client.post("/gemini", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["details"] == "Local tier response"
+    assert mock_gemini_service.generate_response.call_count == 1
+
+
+async def test_prewarm_cache_loads_recent_entries(clean_redis, test_db_session, test_async_db_engine, monkeypatch):
+    """Test startup prewarm copies PostgreSQL entries into Redis and the in-process cache."""
+    from app.config import settings
+    from app.redis_client import redis_client
+    monkeypatch.setattr(settings, "CACHE_PREWARM_LIMIT", 100)
+
+    test_db_session.add(GeminiCache(id="gig-0-1-12", badge="UNKNOWN", details="Prewarmed entry"))
+    test_db_session.commit()
+
+    await prewarm_cache(async_sessionmaker(bind=test_async_db_engine))
+
+    expected = {"badge": "UNKNOWN", "details": "Prewarmed entry"}
+    assert orjson.loads(_l1["gig-0-1-12"]) == expected
+    assert await redis_client.get_cache("gig-0-1-12") == expected
+
+
+async def test_gemini_endpoint_cache_from_redis(client, mock_gemini_service, clean_redis, monkeypatch):
+    """Test a Redis hit is served without querying PostgreSQL."""
+    from unittest.mock import AsyncMock
+    from app import controllers
+    from app.redis_client import redis_client
+    lookup_db_cache = AsyncMock(side_effect=controllers.lookup_db_cache)
+    monkeypatch.setattr(controllers, "lookup_db_cache", lookup_db_cache)
+    await redis_client.set_cache("gig-0-1-13", {"badge": "UNKNOWN", "details": "Redis entry"})
+
+    for _ in range(3):
+        response = client.post(
+            "/gemini",
+            json={"workId": "gig-0-1-13", "hashes": ["ipfs://redis_hash"], "expected": "value"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"badge": "UNKNOWN", "details": "Redis entry"}
+        _l1.clear()
+    lookup_db_cache.assert_not_awaited()
+
+    # A Redis miss falls through to PostgreSQL
+    mock_gemini_service.generate_response.return_value = ("NEEDS REVISION", "After Redis hit")
+    response = client.post(
+        "/gemini",
+        json={"workId": "gig-0-1-14", "hashes": ["ipfs://next_hash"], "expected": "value"}
+    )
+    assert response.status_code == 200
+    assert mock_gemini_service.generate_response.call_count == 1
+    lookup_db_cache.assert_awaited_once()
+
+
+async def test_store_cache_entry_logs_write_failures(clean_redis, caplog):
+    """Test write-behind failures are logged, not raised."""
+    from app.redis_client import redis_client
+
+    def broken_session_factory():
+        raise RuntimeError("database unavailable")
+
+    entry = {"badge": "UNKNOWN", "details": "Write-behind entry"}
+    await store_cache_entry("gig-0-1-15", entry, broken_session_factory)
+
+    assert "Failed to store cache entry for gig-0-1-15" in caplog.text
+    # The Redis copy does not depend on the PostgreSQL write
+    await redis_client.flush_writes()
+    assert await redis_client.get_cache("gig-0-1-15") == entry
+
+
+def test_gemini_endpoint_uses_prefetched_images(client, mock_gemini_service, clean_redis):
+    """Test images downloaded during the cache probes are handed to Gemini."""
+    mock_gemini_service.download_images.return_value = ["part-a", "part-b"]
+    mock_gemini_service.generate_response.return_value = ("UNKNOWN", "Prefetched")
+    response = client.post(
+        "/gemini",
+        json={"workId": "gig-0-1-16", "hashes": ["ipfs://a", "/ipfs/b"], "expected": "value"}
+    )
+
+    assert response.status_code == 200
+    mock_gemini_service.download_images.assert_awaited_once_with(["a", "b"])
+    assert mock_gemini_service.generate_response.await_args.kwargs["parts"] == ["part-a", "part-b"]
+
+
+async def test_prefetch_only_after_redis_miss(mock_gemini_service, clean_redis, test_db_session, app_session_factory):
+    """Test images are not fetched on a Redis hit, and the prefetch is cancelled on a PostgreSQL hit."""
+    from app.redis_client import redis_client
+    cancelled = asyncio.Event()
+
+    async def slow_download(hashes):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    mock_gemini_service.download_images.side_effect = slow_download
+    await redis_client.set_cache("gig-0-1-17", {"badge": "UNKNOWN", "details": "Cached"})
+    test_db_session.add(GeminiCache(id="gig-0-1-19", badge="UNKNOWN", details="Stored"))
+    test_db_session.commit()
+
+    redis_hit = await call_gemini(
+        GeminiRequest(workId="gig-0-1-17", hashes=["ipfs://hit_hash"], expected="value")
+    )
+    mock_gemini_service.download_images.assert_not_called()
+    db_hit = await call_gemini(
+        GeminiRequest(workId="gig-0-1-19", hashes=["ipfs://hit_hash"], expected="value")
+    )
+
+    assert redis_hit.status_code == db_hit.status_code == 200
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    mock_gemini_service.generate_response.assert_not_awaited()
+
+
+async def test_work_id_shaped_like_image_key_is_a_miss(mock_gemini_service, clean_redis, test_db_session, app_session_factory):
+    """Test a workId named like an image key goes to Gemini and leaves the image untouched."""
+    from app.redis_client import redis_client
+    await redis_client.set_bytes("ipfs:collide_cid", b"image/png\x00data", 60)
+    mock_gemini_service.generate_response.return_value = ("UNKNOWN", "Own entry")
+    request = GeminiRequest(workId="ipfs:collide_cid", hashes=["ipfs://collide_hash"], expected="value")
+
+    response = await call_gemini(request)
+    await redis_client.flush_writes()
+
+    assert orjson.loads(response.body) == {"badge": "UNKNOWN", "details": "Own entry"}
+    mock_gemini_service.generate_response.assert_called_once()
+    assert await redis_client.get_bytes("ipfs:collide_cid") == b"image/png\x00data"
+    assert await redis_client.get_cache("ipfs:collide_cid") == {"badge": "UNKNOWN", "details": "Own entry"}
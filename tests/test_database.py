@@ -1,33 +1,39 @@
 """Tests for database models and operations."""
 import pytest
 from datetime import datetime
+from sqlalchemy import insert
 from app.database import GeminiCache
 
+_INSERT_GC = insert(GeminiCache)
 
-def test_create_cache_entry(test_db_session):
+
+def bulk_add(session, rows: list[dict]):
+    """Insert several cache rows in one executemany round-trip and commit."""
+    session.execute(_INSERT_GC, rows)
+    session.commit()
+
+
+def test_create_cache_entry(isolated_db_session):
     """Test creating a cache entry in the database."""
     entry = GeminiCache(
         id="db-test-1",
         badge="MATCHS WITH DESCRIPTION",
         details="Test details for database entry"
     )
-    test_db_session.add(entry)
-    test_db_session.commit()
+    isolated_db_session.add(entry)
+    isolated_db_session.flush()
     
-    # Query back the entry
-    retrieved = test_db_session.query(GeminiCache).filter(
-        GeminiCache.id == "db-test-1"
-    ).first()
+    # Load only the server-side defaults
+    isolated_db_session.refresh(entry, attribute_names=["created_at", "updated_at"])
     
-    assert retrieved is not None
-    assert retrieved.id == "db-test-1"
-    assert retrieved.badge == "MATCHS WITH DESCRIPTION"
-    assert retrieved.details == "Test details for database entry"
-    assert isinstance(retrieved.created_at, datetime)
-    assert isinstance(retrieved.updated_at, datetime)
+    assert entry.id == "db-test-1"
+    assert entry.badge == "MATCHS WITH DESCRIPTION"
+    assert entry.details == "Test details for database entry"
+    assert isinstance(entry.created_at, datetime)
+    assert isinstance(entry.updated_at, datetime)
 
 
-def test_update_cache_entry(test_db_session):
+def test_update_cache_entry(isolated_db_session):
     """Test updating an existing cache entry."""
     # Create entry
     entry = GeminiCache(
@@ -35,57 +41,50 @@ def test_update_cache_entry(test_db_session):
         badge="UNKNOWN",
         details="Initial details"
     )
-    test_db_session.add(entry)
-    test_db_session.commit()
+    isolated_db_session.add(entry)
+    isolated_db_session.commit()
     
     # Update entry
     entry.badge = "MATCHS WITH DESCRIPTION"
     entry.details = "Updated details"
-    test_db_session.commit()
+    isolated_db_session.commit()
     
     # Verify update
-    retrieved = test_db_session.query(GeminiCache).filter(
-        GeminiCache.id == "update_test"
-    ).first()
+    retrieved = isolated_db_session.get(GeminiCache, "update_test")
     
     assert retrieved.badge == "MATCHS WITH DESCRIPTION"
     assert retrieved.details == "Updated details"
 
 
-def test_query_by_hash(test_db_session):
+def test_query_by_hash(isolated_db_session):
     """Test querying cache entries by id."""
     # Create multiple entries
-    entries = [
-        GeminiCache(id="db-test-query-1", badge="MATCHS WITH DESCRIPTION", details="Details 1"),
-        GeminiCache(id="db-test-query-2", badge="NEEDS REVISION", details="Details 2"),
-        GeminiCache(id="db-test-query-3", badge="UNKNOWN", details="Details 3"),
-    ]
-    for entry in entries:
-        test_db_session.add(entry)
-    test_db_session.commit()
+    bulk_add(isolated_db_session, [
+        {"id": "db-test-query-1", "badge": "MATCHS WITH DESCRIPTION", "details": "Details 1"},
+        {"id": "db-test-query-2", "badge": "NEEDS REVISION", "details": "Details 2"},
+        {"id": "db-test-query-3", "badge": "UNKNOWN", "details": "Details 3"},
+    ])
     
     # Query specific id
-    result = test_db_session.query(GeminiCache).filter(
-        GeminiCache.id == "db-test-query-2"
-    ).first()
+    result = isolated_db_session.get(GeminiCache, "db-test-query-2")
     
     assert result is not None
     assert result.badge == "NEEDS REVISION"
     assert result.details == "Details 2"
 
 
-def test_hash_primary_key_constraint(test_db_session):
+def test_hash_primary_key_constraint(isolated_db_session):
     """Test that id is unique (primary key constraint)."""
     entry1 = GeminiCache(
         id="duplicate_id",
         badge="MATCHS WITH DESCRIPTION",
         details="First entry"
     )
-    test_db_session.add(entry1)
-    test_db_session.commit()
+    isolated_db_session.add(entry1)
+    isolated_db_session.commit()
     
     # Expunge to avoid identity conflict
-    test_db_session.expunge(entry1)
+    isolated_db_session.expunge(entry1)
     
     # Try to insert another entry with same id
     entry2 = GeminiCache(
@@ -93,51 +92,65 @@ def test_hash_primary_key_constraint(test_db_session):
         badge="NEEDS REVISION",
         details="Second entry"
     )
-    test_db_session.add(entry2)
+    isolated_db_session.add(entry2)
     
     with pytest.raises(Exception):  # Will raise IntegrityError
-        test_db_session.commit()
+        isolated_db_session.commit()
 
 
-def test_delete_cache_entry(test_db_session):
+def test_delete_cache_entry(isolated_db_session):
     """Test deleting a cache entry."""
     entry = GeminiCache(
         id="delete_test",
         badge="MATCHS WITH DESCRIPTION",
         details="To be deleted"
     )
-    test_db_session.add(entry)
-    test_db_session.commit()
+    isolated_db_session.add(entry)
+    isolated_db_session.commit()
     
     # Delete entry
-    test_db_session.delete(entry)
-    test_db_session.commit()
+    isolated_db_session.delete(entry)
+    isolated_db_session.commit()
     
     # Verify deletion
-    result = test_db_session.query(GeminiCache).filter(
-        GeminiCache.id == "delete_test"
-    ).first()
+    result = isolated_db_session.get(GeminiCache, "delete_test")
     
     assert result is None
 
 
-def test_all_badge_types(test_db_session):
-    """Test storing all three badge types."""
-    badges = ["MATCHS WITH DESCRIPTION", "NEEDS REVISION", "UNKNOWN"]
-    
-    for i, badge in enumerate(badges):
-        entry = GeminiCache(
-            id=f"badge_test_{i}",
-            badge=badge,
-            details=f"Details for {badge}"
-        )
-        test_db_session.add(entry)
-    
-    test_db_session.commit()
-    
-    # Verify all were stored
-    for i, badge in enumerate(badges):
-        result = test_db_session.query(GeminiCache).filter(
-            GeminiCache.id == f"badge_test_{i}"
-        ).first()
-        assert result.badge == badge
+@pytest.mark.parametrize("badge", ["MATCHS WITH DESCRIPTION", "NEEDS REVISION", "UNKNOWN"])
+def test_all_badge_types(isolated_db_session, badge):
+    """Test storing each of the three badge types."""
+    bulk_add(isolated_db_session, [
+        {"id": "badge_test", "badge": badge, "details": f"Details for {badge}"}
+    ])
+    
+    result = isolated_db_session.get(GeminiCache, "badge_test")
+    assert result.badge == badge
+
+
+def test_pool_limits_bounded_by_max_connections(monkeypatch):
+    """Test pool limits never exceed the replica's share of max_connections."""
+    from app.config import settings
+    from app.database import bounded_pool_limits
+
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    monkeypatch.setattr(settings, "APP_REPLICAS", 4)
+
+    assert bounded_pool_limits(100) == (5, 10)
+    assert bounded_pool_limits(24) == (5, 1)
+    assert bounded_pool_limits(8) == (2, 0)
+
+
+def test_updated_at_index_created_for_existing_table(test_db_engine):
+    """Test schema setup adds the updated_at index to an existing table."""
+    from sqlalchemy import inspect, text
+    from app.database import create_schema
+
+    with test_db_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_gemini_cache_updated_at"))
+        create_schema(conn)
+
+    index_names = {index["name"] for index in inspect(test_db_engine).get_indexes("gemini_cache")}
+    assert "ix_gemini_cache_updated_at" in index_names
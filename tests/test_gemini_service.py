@@ -0,0 +1,224 @@
+"""Tests for Gemini service."""
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.gemini_service import GeminiService, IPFSDownloadError
+
+
+def make_service(handler) -> GeminiService:
+    """Create a GeminiService whose HTTP client is served by `handler`."""
+    service = GeminiService()
+    service._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+async def test_get_image_returns_fastest_gateway(clean_redis, monkeypatch):
+    """Test the first successful gateway response wins the race."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "IPFS_HEDGE_DELAY", 0.01)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "ipfs.io":
+            return httpx.Response(200, content=b"fast", headers={"content-type": "image/png"})
+        await asyncio.sleep(1)
+        return httpx.Response(200, content=b"slow", headers={"content-type": "image/png"})
+
+    service = make_service(handler)
+    image_bytes, mime_type = await asyncio.wait_for(service.get_image("race_cid"), timeout=0.5)
+
+    assert image_bytes == b"fast"
+    assert mime_type == "image/png"
+
+
+async def test_get_image_skips_failing_gateways(clean_redis):
+    """Test gateway errors fall through to a gateway that succeeds."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "dweb.link":
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, content=b"ok", headers={"content-type": "image/jpeg"})
+        return httpx.Response(503)
+
+    service = make_service(handler)
+    image_bytes, mime_type = await service.get_image("fallback_cid")
+
+    assert image_bytes == b"ok"
+    assert mime_type == "image/jpeg"
+
+
+async def test_get_image_waits_hedge_delay_before_next_gateway(clean_redis):
+    """Test a gateway answering within the hedge delay is the only one queried."""
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=b"img", headers={"content-type": "image/gif"})
+
+    service = make_service(handler)
+    assert await service.get_image("hedge_cid") == (b"img", "image/gif")
+    assert calls == ["gateway.pinata.cloud"]
+
+
+async def test_get_image_rejects_non_image_responses(clean_redis):
+    """Test gateway pages that are not images are treated as failures."""
+    service = make_service(lambda request: httpx.Response(
+        200, content=b"<html>", headers={"content-type": "text/html"}
+    ))
+
+    with pytest.raises(IPFSDownloadError, match="not an image"):
+        await service.get_image("html_cid")
+
+
+async def test_get_image_all_gateways_fail(clean_redis):
+    """Test an error is raised when no gateway returns the image."""
+    service = make_service(lambda request: httpx.Response(404))
+
+    with pytest.raises(IPFSDownloadError, match="test_cid"):
+        await service.get_image("test_cid")
+
+
+async def test_get_image_cached_by_cid(clean_redis):
+    """Test downloaded images are cached in Redis and served without a gateway call."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        return httpx.Response(200, content=b"\x89PNG\x00data", headers={"content-type": "image/png"})
+
+    service = make_service(handler)
+    first = await service.get_image("cached_cid")
+    gateway_calls = len(calls)
+    second = await service.get_image("cached_cid")
+
+    assert first == second == (b"\x89PNG\x00data", "image/png")
+    assert len(calls) == gateway_calls
+
+
+async def test_get_image_skips_redis_for_large_images(clean_redis, monkeypatch):
+    """Test images above IPFS_CACHE_MAX_BYTES are returned but not stored in Redis."""
+    from app.config import settings
+    from app.redis_client import redis_client
+    monkeypatch.setattr(settings, "IPFS_CACHE_MAX_BYTES", 4)
+    service = make_service(lambda request: httpx.Response(
+        200, content=b"0123456789", headers={"content-type": "image/png"}
+    ))
+
+    assert await service.get_image("big_cid") == (b"0123456789", "image/png")
+    assert await redis_client.get_bytes("ipfs:big_cid") is None
+
+
+@pytest.mark.parametrize("response_text, badge, details", [
+    (
+        "DETAILS: Blue ceramic mug is present.\nCLASSIFICATION: MATCHS WITH DESCRIPTION",
+        "MATCHS WITH DESCRIPTION",
+        "Blue ceramic mug is present.",
+    ),
+    (
+        "  details:  No mug visible; instead a bottle.  \n\n  Classification: needs revision",
+        "NEEDS REVISION",
+        "No mug visible; instead a bottle.",
+    ),
+    (
+        "Here is my answer\nDETAILS: Image too blurred.\nNote: cropped\nCLASSIFICATION: UNKNOWN",
+        "UNKNOWN",
+        "Image too blurred.",
+    ),
+    (
+        "The artwork NEEDS REVISION overall",
+        "NEEDS REVISION",
+        "The artwork NEEDS REVISION overall",
+    ),
+    (
+        "MATCHS WITH DESCRIPTION",
+        "MATCHS WITH DESCRIPTION",
+        "MATCHS WITH DESCRIPTION",
+    ),
+    (
+        "Matchs with description? No, it needs revision",
+        "NEEDS REVISION",
+        "Matchs with description? No, it needs revision",
+    ),
+    (
+        "CLASSIFICATION: MATCHS WITH DESCRIPTION\nDETAILS: order swapped",
+        "MATCHS WITH DESCRIPTION",
+        "CLASSIFICATION: MATCHS WITH DESCRIPTION\nDETAILS: order swapped",
+    ),
+])
+def test_parse_response(response_text, badge, details):
+    """Test badge and details parsing of Gemini response text."""
+    service = GeminiService()
+    assert service.parse_response(response_text) == (badge, details)
+
+
+async def test_generate_response_uses_async_client(clean_redis, monkeypatch):
+    """Test Gemini is called through the non-blocking async client."""
+    service = GeminiService()
+    monkeypatch.setattr(service, "download_image", AsyncMock(return_value="image-part"))
+    generate_content = AsyncMock(return_value=Mock(
+        text="DETAILS: Mug is present.\nCLASSIFICATION: MATCHS WITH DESCRIPTION"
+    ))
+    monkeypatch.setattr(service.client.aio.models, "generate_content", generate_content)
+
+    badge, details = await service.generate_response(hashes=["cid1", "cid2"], expected_value="mug")
+
+    assert (badge, details) == ("MATCHS WITH DESCRIPTION", "Mug is present.")
+    contents = generate_content.await_args.kwargs["contents"]
+    assert contents[:2] == ["image-part", "image-part"]
+    assert contents[2] == "Expected: mug"
+    config = generate_content.await_args.kwargs["config"]
+    assert "STRICT OUTPUT RULES" in config.system_instruction
+
+
+async def test_download_image_reuses_parts(monkeypatch):
+    """Test repeated CIDs reuse the cached Gemini part."""
+    service = GeminiService()
+    get_image = AsyncMock(return_value=(b"image-bytes", "image/png"))
+    monkeypatch.setattr(service, "get_image", get_image)
+
+    first = await service.download_image("part_cid")
+    second = await service.download_image("part_cid")
+
+    assert first is second
+    assert first.inline_data.data == b"image-bytes"
+    get_image.assert_awaited_once()
+
+
+async def test_get_image_rejects_oversized_images(clean_redis, monkeypatch):
+    """Test images larger than IPFS_MAX_IMAGE_BYTES are not downloaded."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "IPFS_MAX_IMAGE_BYTES", 8)
+    service = make_service(lambda request: httpx.Response(
+        200, content=b"0123456789", headers={"content-type": "image/png"}
+    ))
+
+    with pytest.raises(IPFSDownloadError, match="exceeds 8 bytes"):
+        await service.get_image("large_cid")
+
+
+async def test_close_releases_shared_http_client():
+    """Test the shared HTTP client is reused until closed, then recreated."""
+    service = GeminiService()
+    client = service.open()
+
+    assert service.http is client
+    await service.close()
+    assert client.is_closed
+    assert service.http is not client
+    await service.close()
+
+
+async def test_download_images_probes_redis_once(clean_redis, monkeypatch):
+    """Test cached images for a multi-hash request are read with one MGET."""
+    from app.redis_client import redis_client
+    await redis_client.set_bytes("ipfs:mget_a", b"image/png\x00aaa", 60)
+    await redis_client.set_bytes("ipfs:mget_b", b"image/gif\x00bbb", 60)
+    service = make_service(lambda request: httpx.Response(404))
+    get_bytes = AsyncMock(side_effect=redis_client.get_bytes)
+    monkeypatch.setattr(redis_client, "get_bytes", get_bytes)
+
+    parts = await service.download_images(["mget_a", "mget_b", "mget_a"])
+
+    assert [part.inline_data.data for part in parts] == [b"aaa", b"bbb", b"aaa"]
+    assert parts[1].inline_data.mime_type == "image/gif"
+    get_bytes.assert_not_awaited()
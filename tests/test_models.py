@@ -1,76 +1,69 @@
 """Tests for Pydantic models."""
 import pytest
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 from app.models import GeminiRequest, GeminiResponse
 
+_REQ = TypeAdapter(GeminiRequest)
+_RESP = TypeAdapter(GeminiResponse)
+_REQ_LIST = TypeAdapter(list[GeminiRequest])
+
 
 def test_gemini_request_valid():
     """Test creating a valid GeminiRequest."""
-    request = GeminiRequest(
-        workId="gig-0-1-1",
-        hashes=["ipfs://test_hash_123"],
-        expected="test_expected_value"
-    )
+    request = _REQ.validate_python({
+        "workId": "gig-0-1-1",
+        "hashes": ["ipfs://test_hash_123"],
+        "expected": "test_expected_value",
+    })
     assert request.workId == "gig-0-1-1"
     assert request.hashes == ["ipfs://test_hash_123"]
     assert request.expected == "test_expected_value"
 
 
-def test_gemini_request_missing_hash():
-    """Test GeminiRequest validation fails without hashes."""
+@pytest.mark.parametrize("payload, missing", [
+    ({"workId": "gig-0-1-1", "expected": "test_value"}, "hashes"),
+    ({"workId": "gig-0-1-1", "hashes": ["ipfs://test_hash"]}, "expected"),
+])
+def test_gemini_request_missing_field(payload, missing):
+    """Test GeminiRequest validation fails when a required field is missing."""
     with pytest.raises(ValidationError) as exc_info:
-        GeminiRequest(workId="gig-0-1-1", expected="test_value")
+        _REQ.validate_python(payload)
     
     errors = exc_info.value.errors()
-    assert any(error["loc"] == ("hashes",) for error in errors)
-
-
-def test_gemini_request_missing_expected():
-    """Test GeminiRequest validation fails without expected."""
+    assert any(error["loc"] == (missing,) for error in errors)
+
+
+@pytest.mark.parametrize("hash_value", [
+    "ipfs://bafy/../admin",
+    "ipfs://bafy?x=1",
+    "https://evil.example/ipfs/bafy",
+    "ipfs://",
+    "bafy hash",
+])
+def test_gemini_request_rejects_malformed_hashes(hash_value):
+    """Test hashes that are not a single CID segment are rejected."""
     with pytest.raises(ValidationError) as exc_info:
-        GeminiRequest(workId="gig-0-1-1", hashes=["ipfs://test_hash"])
-    
-    errors = exc_info.value.errors()
-    assert any(error["loc"] == ("expected",) for error in errors)
+        _REQ.validate_python({"workId": "gig-0-1-1", "hashes": [hash_value], "expected": "test_value"})
 
+    assert exc_info.value.errors()[0]["loc"] == ("hashes", 0)
 
-def test_gemini_response_trusted():
-    """Test creating a GeminiResponse with MATCHS WITH DESCRIPTION badge."""
-    response = GeminiResponse(
-        badge="MATCHS WITH DESCRIPTION",
-        details="This is trusted data"
-    )
-    assert response.badge == "MATCHS WITH DESCRIPTION"
-    assert response.details == "This is trusted data"
 
-
-def test_gemini_response_untrusted():
-    """Test creating a GeminiResponse with NEEDS REVISION badge."""
-    response = GeminiResponse(
-        badge="NEEDS REVISION",
-        details="This is untrusted data"
-    )
-    assert response.badge == "NEEDS REVISION"
-    assert response.details == "This is untrusted data"
-
-
-def test_gemini_response_unknown():
-    """Test creating a GeminiResponse with UNKNOWN badge."""
-    response = GeminiResponse(
-        badge="UNKNOWN",
-        details="Cannot determine trust level"
-    )
-    assert response.badge == "UNKNOWN"
-    assert response.details == "Cannot determine trust level"
+@pytest.mark.parametrize("badge, details", [
+    ("MATCHS WITH DESCRIPTION", "This is trusted data"),
+    ("NEEDS REVISION", "This is untrusted data"),
+    ("UNKNOWN", "Cannot determine trust level"),
+])
+def test_gemini_response_badges(badge, details):
+    """Test creating a GeminiResponse with each allowed badge."""
+    response = _RESP.validate_python({"badge": badge, "details": details})
+    assert response.badge == badge
+    assert response.details == details
 
 
 def test_gemini_response_invalid_badge():
     """Test GeminiResponse validation fails with invalid badge."""
     with pytest.raises(ValidationError) as exc_info:
-        GeminiResponse(
-            badge="INVALID_BADGE",
-            details="Some details"
-        )
+        _RESP.validate_python({"badge": "INVALID_BADGE", "details": "Some details"})
     
     errors = exc_info.value.errors()
     assert any(error["loc"] == ("badge",) for error in errors)
@@ -79,7 +72,7 @@ def test_gemini_response_invalid_badge():
 def test_gemini_response_missing_details():
     """Test GeminiResponse validation fails without details."""
     with pytest.raises(ValidationError) as exc_info:
-        GeminiResponse(badge="MATCHS WITH DESCRIPTION")
+        _RESP.validate_python({"badge": "MATCHS WITH DESCRIPTION"})
     
     errors = exc_info.value.errors()
     assert any(error["loc"] == ("details",) for error in errors)
@@ -87,15 +80,22 @@ def test_gemini_response_missing_details():
 
 def test_gemini_models_json_serialization():
     """Test that models can be serialized to JSON."""
-    request = GeminiRequest(workId="gig-0-1-1", hashes=["ipfs://test"], expected="value")
+    requests = [
+        GeminiRequest(workId="gig-0-1-1", hashes=["ipfs://test"], expected="value"),
+        GeminiRequest(workId="gig-0-1-2", hashes=["ipfs://a", "ipfs://b"], expected="other"),
+    ]
     response = GeminiResponse(badge="MATCHS WITH DESCRIPTION", details="Test details")
     
     # Test serialization
-    request_json = request.model_dump()
-    response_json = response.model_dump()
+    request_json = _REQ_LIST.dump_python(requests)
+    response_json = _RESP.dump_python(response)
     
-    assert isinstance(request_json, dict)
+    assert isinstance(request_json, list)
     assert isinstance(response_json, dict)
-    assert request_json["workId"] == "gig-0-1-1"
-    assert request_json["hashes"] == ["ipfs://test"]
+    assert request_json[0]["workId"] == "gig-0-1-1"
+    assert request_json[0]["hashes"] == ["ipfs://test"]
+    assert request_json[1]["hashes"] == ["ipfs://a", "ipfs://b"]
     assert response_json["badge"] == "MATCHS WITH DESCRIPTION"
+    
+    # JSON bytes round-trip straight through pydantic-core
+    assert _REQ_LIST.validate_json(_REQ_LIST.dump_json(requests)) == requests
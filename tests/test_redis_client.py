@@ -0,0 +1,126 @@
+"""Tests for Redis client."""
+import asyncio
+import orjson
+from app.redis_client import entry_key, redis_client
+
+
+async def test_large_values_stored_compressed(clean_redis):
+    """Test large cache values are zstd-compressed in Redis and round-trip intact."""
+    value = {"badge": "NEEDS REVISION", "details": "The mug is missing. " * 100}
+    await redis_client.set_cache("redis-test-large", value)
+
+    stored = await redis_client.get_client().get(entry_key("redis-test-large"))
+    assert stored.startswith(b"Z")
+    assert len(stored) < len(orjson.dumps(value))
+    assert await redis_client.get_cache("redis-test-large") == value
+
+
+async def test_small_and_legacy_values_round_trip(clean_redis):
+    """Test small values are stored raw and plain JSON entries still decode."""
+    value = {"badge": "UNKNOWN", "details": "short"}
+    await redis_client.set_cache("redis-test-small", value)
+    await redis_client.get_client().set(entry_key("redis-test-legacy"), orjson.dumps(value))
+
+    assert (await redis_client.get_client().get(entry_key("redis-test-small"))).startswith(b"R")
+    assert await redis_client.get_cache("redis-test-small") == value
+    assert await redis_client.get_cache("redis-test-legacy") == value
+
+
+async def test_get_and_touch_refreshes_ttl(clean_redis):
+    """Test reading an entry through get_and_touch extends its expiry."""
+    value = {"badge": "UNKNOWN", "details": "hot entry"}
+    await redis_client.set_cache("redis-test-touch", value, expire=10)
+
+    assert await redis_client.get_and_touch("redis-test-touch", expire=500) == value
+    assert await redis_client.get_client().ttl(entry_key("redis-test-touch")) > 10
+    assert await redis_client.get_and_touch("redis-test-missing") is None
+
+
+async def test_queued_writes_flushed_in_batches(clean_redis, monkeypatch):
+    """Test write-behind cache sets are drained into Redis in bounded batches."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "REDIS_WRITE_BATCH_SIZE", 2)
+    for i in range(5):
+        redis_client.queue_cache(f"redis-test-queued-{i}", {"badge": "UNKNOWN", "details": str(i)})
+    redis_client.queue_cache("redis-test-queued-0", {"badge": "UNKNOWN", "details": "later"})
+
+    await redis_client.flush_writes()
+
+    assert await redis_client.get_cache("redis-test-queued-0") == {"badge": "UNKNOWN", "details": "0"}
+    assert await redis_client.get_cache("redis-test-queued-4") == {"badge": "UNKNOWN", "details": "4"}
+    assert not redis_client._write_buffer
+
+
+def test_clients_of_closed_loops_are_dropped():
+    """Test per-loop clients are evicted once their event loop has closed."""
+    from app.config import settings
+    from app.redis_client import RedisClient
+    client_cache = RedisClient()
+
+    async def get_client():
+        return client_cache.get_client()
+
+    first = asyncio.run(get_client())
+    second = asyncio.run(get_client())
+
+    assert first is not second
+    assert list(client_cache._client_cache.values()) == [second]
+    assert second.connection_pool.max_connections == settings.REDIS_POOL_SIZE
+
+
+async def test_queued_writes_keep_existing_entries(clean_redis):
+    """Test write-behind sets never overwrite an entry already in Redis."""
+    await redis_client.set_cache("redis-test-existing", {"badge": "UNKNOWN", "details": "first"})
+    redis_client.queue_cache("redis-test-existing", {"badge": "NEEDS REVISION", "details": "second"})
+    await redis_client.flush_writes()
+
+    assert await redis_client.get_cache("redis-test-existing") == {"badge": "UNKNOWN", "details": "first"}
+
+
+async def test_long_keys_stored_as_digests(clean_redis):
+    """Test long cache keys are stored under a short digest and stay addressable."""
+    from app.redis_client import redis_key
+    cid_key = "ipfs:bafybeihdwdcefgh4dqkjv67uzcmwiyje6z4g3d5y5r3g4a3g5j6e6q7e"
+    await redis_client.set_bytes(cid_key, b"image", 60)
+
+    assert redis_key("gig-0-1-1") == b"gig-0-1-1"
+    assert len(redis_key(cid_key)) == 18
+    assert await redis_client.get_client().get(cid_key) is None
+    assert await redis_client.get_bytes(cid_key) == b"image"
+
+
+async def test_entries_do_not_share_keys_with_images(clean_redis):
+    """Test a workId spelled like an image key neither reads nor overwrites the image."""
+    await redis_client.set_bytes("ipfs:collide", b"image/png\x00data", 60)
+
+    assert await redis_client.get_cache("ipfs:collide") is None
+    assert await redis_client.get_and_touch("ipfs:collide") is None
+    await redis_client.set_cache("ipfs:collide", {"badge": "UNKNOWN", "details": "x"})
+
+    assert entry_key("gig-0-1-1") == b"g:gig-0-1-1"
+    assert await redis_client.get_bytes("ipfs:collide") == b"image/png\x00data"
+    assert await redis_client.get_cache("ipfs:collide") == {"badge": "UNKNOWN", "details": "x"}
+
+
+def test_unix_socket_connection(monkeypatch):
+    """Test REDIS_UNIX_SOCKET switches the pool to unix domain socket connections."""
+    import redis.asyncio as redis
+    from app.config import settings
+    from app.redis_client import RedisClient
+    monkeypatch.setattr(settings, "REDIS_UNIX_SOCKET", "/var/run/redis/redis.sock")
+
+    pool = RedisClient()._create_client().connection_pool
+
+    assert pool.connection_class is redis.UnixDomainSocketConnection
+    assert pool.connection_kwargs["path"] == "/var/run/redis/redis.sock"
+
+
+async def test_delete_cache_evicts_local_tier(clean_redis):
+    """Test deleting an entry removes it from Redis and the in-process tier."""
+    redis_client.local["redis-test-delete"] = b'{"badge":"UNKNOWN","details":"x"}'
+    await redis_client.set_cache("redis-test-delete", {"badge": "UNKNOWN", "details": "x"})
+
+    await redis_client.delete_cache("redis-test-delete")
+
+    assert "redis-test-delete" not in redis_client.local
+    assert await redis_client.get_cache("redis-test-delete") is None